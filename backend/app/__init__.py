@@ -1 +1,9 @@
 # RAG Web Application Backend
+import os
+
+from app.config import EMBEDDING_THREADS
+
+# OpenMP and MKL size their pools once, when torch, faiss and numpy are
+# first imported, so the defaults must be in place before that happens
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, str(EMBEDDING_THREADS))
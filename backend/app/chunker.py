@@ -1,10 +1,28 @@
 """
 Document chunking utilities for splitting documents into smaller passages.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 from dataclasses import dataclass
+
+import numpy as np
+
 from app.config import CHUNK_SIZE, CHUNK_OVERLAP
 
+# Chunks' worth of text chunk_text_stream buffers before chunking
+STREAM_WINDOW = 64
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; fall back to the NumPy scan
+    njit = None
+
+_SENTENCE_END = np.array([ord('.'), ord('!'), ord('?')], dtype=np.uint32)
+_SPACE = ord(' ')
+# Code points stripped by str.strip()
+_WHITESPACE = np.array(
+    [c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32
+)
+
 
 @dataclass
 class Chunk:
@@ -14,6 +32,174 @@ class Chunk:
     chunk_index: int
 
 
+@dataclass
+class ChunkBatch:
+    """Chunks of many documents as parallel arrays, one entry per chunk."""
+    texts: List[str]
+    sources: List[str]
+    chunk_indices: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        """Build the metadata dict chunk_text would attach to chunk i."""
+        return {
+            "source": self.sources[i],
+            "chunk_index": int(self.chunk_indices[i]),
+            "start_char": int(self.starts[i]),
+            "end_char": int(self.ends[i])
+        }
+
+
+def _is_space(c) -> bool:
+    """Match str.isspace() for a single code point."""
+    return (
+        c == 32 or 9 <= c <= 13 or 28 <= c <= 31 or c == 0x85 or c == 0xa0
+        or c == 0x1680 or 0x2000 <= c <= 0x200a or c == 0x2028
+        or c == 0x2029 or c == 0x202f or c == 0x205f or c == 0x3000
+    )
+
+
+def _scan_chunks(
+    buf: np.ndarray,
+    chunk_size: int,
+    overlap: int,
+    partial: bool
+) -> Tuple[np.ndarray, int]:
+    """
+    Compute chunk offsets with a reverse character scan (compiled by Numba).
+
+    Args:
+        buf: Text as a uint32 array of code points
+        chunk_size: Maximum characters per chunk
+        overlap: Number of overlapping characters between chunks
+        partial: buf is a prefix of the text; stop before any chunk that
+            could change once more text arrives
+
+    Returns:
+        Tuple of ((N, 2) int32 array of (start, end) offsets for non-blank
+        chunks, offset where chunking resumes)
+    """
+    n = buf.shape[0]
+    spans = np.empty((16, 2), dtype=np.int32)
+    count = 0
+    start = 0
+
+    while start < n:
+        if partial and start + chunk_size >= n:
+            break
+
+        end = start + chunk_size
+
+        if end < n:
+            # Look for sentence boundary (. ! ?) followed by a space; one
+            # right at start still counts as found, and keeps the full cut
+            boundary = -1
+            p = end - 2
+            while p >= start:
+                c = buf[p]
+                if buf[p + 1] == 32 and (c == 46 or c == 33 or c == 63):
+                    boundary = p
+                    break
+                p -= 1
+            if boundary == -1:
+                # Fall back to word boundary
+                p = end - 1
+                while p > start:
+                    if buf[p] == 32:
+                        boundary = p
+                        break
+                    p -= 1
+            if boundary > start:
+                end = boundary + 1
+
+        # Skip chunks that would be empty after stripping
+        p = start
+        stop = min(end, n)
+        while p < stop and _is_space(buf[p]):
+            p += 1
+        if p < stop:
+            if count == spans.shape[0]:
+                grown = np.empty((count * 2, 2), dtype=np.int32)
+                grown[:count] = spans
+                spans = grown
+            spans[count, 0] = start
+            spans[count, 1] = end
+            count += 1
+
+        # Move start position with overlap, always making progress
+        next_start = end - overlap if end < n else end
+        start = next_start if next_start > start else end
+
+    return spans[:count], start
+
+
+def _search_chunks(
+    buf: np.ndarray,
+    chunk_size: int,
+    overlap: int,
+    partial: bool
+) -> Tuple[np.ndarray, int]:
+    """
+    Compute chunk offsets from precomputed boundary arrays.
+
+    Same contract as _scan_chunks; used when Numba is not installed.
+    """
+    n = len(buf)
+    spaces = np.flatnonzero(buf == _SPACE)
+    before_space = spaces[spaces > 0] - 1
+    sentences = before_space[np.isin(buf[before_space], _SENTENCE_END)]
+    # Running count of non-blank characters, to test a span in O(1)
+    solid = np.concatenate(([0], np.cumsum(~np.isin(buf, _WHITESPACE))))
+
+    spans = []
+    start = 0
+
+    while start < n:
+        if partial and start + chunk_size >= n:
+            break
+
+        end = start + chunk_size
+
+        if end < n:
+            # Last sentence end (. ! ?) whose trailing space fits in the chunk
+            i = np.searchsorted(sentences, end - 1) - 1
+            boundary = int(sentences[i]) if i >= 0 else -1
+            if boundary < start:
+                # Fall back to word boundary
+                i = np.searchsorted(spaces, end) - 1
+                boundary = int(spaces[i]) if i >= 0 else -1
+
+            if boundary > start:
+                end = boundary + 1
+
+        if solid[min(end, n)] > solid[start]:
+            spans.append((start, end))
+
+        # Move start position with overlap, always making progress
+        next_start = end - overlap if end < n else end
+        start = next_start if next_start > start else end
+
+    return np.array(spans, dtype=np.int32).reshape(-1, 2), start
+
+
+if njit is not None:
+    _is_space = njit(cache=True)(_is_space)
+    _chunk_indices = njit(cache=True)(_scan_chunks)
+else:
+    _chunk_indices = _search_chunks
+
+
+def _code_points(text: str) -> np.ndarray:
+    """View text as code points for the boundary scan."""
+    # UTF-32 is fixed width, so array offsets match str offsets even for
+    # non-ASCII text
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
 def chunk_text(
     text: str,
     source: str,
@@ -37,49 +223,135 @@ def chunk_text(
 
     # Clean the text
     text = text.strip()
+    spans, _ = _chunk_indices(_code_points(text), chunk_size, overlap, False)
     chunks = []
-    start = 0
-    chunk_index = 0
 
-    while start < len(text):
-        # Find the end of the chunk
-        end = start + chunk_size
+    for chunk_index, (start, end) in enumerate(spans.tolist()):
+        chunks.append(Chunk(
+            text=text[start:end].strip(),
+            metadata={
+                "source": source,
+                "chunk_index": chunk_index,
+                "start_char": start,
+                "end_char": end
+            },
+            chunk_index=chunk_index
+        ))
 
-        # Try to break at a sentence or word boundary
-        if end < len(text):
-            # Look for sentence boundary (. ! ?)
-            boundary = text.rfind('. ', start, end)
-            if boundary == -1:
-                boundary = text.rfind('! ', start, end)
-            if boundary == -1:
-                boundary = text.rfind('? ', start, end)
-            if boundary == -1:
-                # Fall back to word boundary
-                boundary = text.rfind(' ', start, end)
+    return chunks
 
-            if boundary > start:
-                end = boundary + 1
 
-        chunk_text = text[start:end].strip()
+def chunk_text_stream(
+    parts: Iterable[str],
+    source: str,
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP
+) -> Iterator[Chunk]:
+    """
+    Split streamed text into overlapping chunks as it arrives.
+
+    Yields the same chunks as chunk_text("".join(parts)) while holding only
+    a window of about STREAM_WINDOW chunks in memory.
+
+    Args:
+        parts: Consecutive pieces of the full text
+        source: Source identifier (filename, URL, etc.)
+        chunk_size: Maximum characters per chunk
+        overlap: Number of overlapping characters between chunks
+
+    Yields:
+        Chunk objects in document order
+    """
+    pending: List[str] = []
+    pending_len = 0
+    offset = 0  # Position of the buffer within the stripped text
+    chunk_index = 0
+    started = False
+    window = chunk_size * STREAM_WINDOW
 
-        if chunk_text:
-            chunks.append(Chunk(
-                text=chunk_text,
+    def emit(text: str, partial: bool) -> Iterator[Chunk]:
+        nonlocal chunk_index
+        spans, resume = _chunk_indices(
+            _code_points(text), chunk_size, overlap, partial
+        )
+        for start, end in spans.tolist():
+            yield Chunk(
+                text=text[start:end].strip(),
                 metadata={
                     "source": source,
                     "chunk_index": chunk_index,
-                    "start_char": start,
-                    "end_char": end
+                    "start_char": offset + start,
+                    "end_char": offset + end
                 },
                 chunk_index=chunk_index
-            ))
+            )
             chunk_index += 1
+        return resume
 
-        # Move start position with overlap
-        start = end - overlap if end < len(text) else end
+    for part in parts:
+        if not started:
+            # Mirror chunk_text's strip() of the whole text
+            part = part.lstrip()
+            started = bool(part)
+        if not part:
+            continue
+        pending.append(part)
+        pending_len += len(part)
+        if pending_len < window:
+            continue
 
-        # Prevent infinite loop
-        if start <= chunks[-1].metadata["start_char"] if chunks else 0:
-            start = end
+        buffer = "".join(pending)
+        # Trailing whitespace may still be stripped from the end of the text
+        resume = yield from emit(buffer.rstrip(), True)
+        buffer = buffer[resume:]
+        pending = [buffer] if buffer else []
+        pending_len = len(buffer)
+        offset += resume
 
-    return chunks
+    if pending:
+        yield from emit("".join(pending).rstrip(), False)
+
+
+def chunk_texts_batch(
+    docs: Iterable[Tuple[str, str]],
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP
+) -> ChunkBatch:
+    """
+    Split many documents into chunks without a Chunk object per chunk.
+
+    Args:
+        docs: (text, source) pairs
+        chunk_size: Maximum characters per chunk
+        overlap: Number of overlapping characters between chunks
+
+    Returns:
+        ChunkBatch holding the same chunks chunk_text would produce for
+        each document, in order
+    """
+    texts: List[str] = []
+    sources: List[str] = []
+    spans_per_doc = [np.empty((0, 2), dtype=np.int32)]
+
+    for text, source in docs:
+        text = text.strip() if text else ""
+        if not text:
+            continue
+
+        spans, _ = _chunk_indices(_code_points(text), chunk_size, overlap, False)
+        texts.extend([text[start:end].strip() for start, end in spans.tolist()])
+        sources.extend([source] * len(spans))
+        spans_per_doc.append(spans)
+
+    spans = np.concatenate(spans_per_doc)
+    chunk_indices = np.concatenate(
+        [np.arange(len(doc_spans), dtype=np.int32) for doc_spans in spans_per_doc]
+    )
+
+    return ChunkBatch(
+        texts=texts,
+        sources=sources,
+        chunk_indices=chunk_indices,
+        starts=spans[:, 0],
+        ends=spans[:, 1]
+    )
@@ -15,13 +15,26 @@ INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
 # Embedding model
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")
+EMBEDDING_MODEL_FILE = os.getenv("EMBEDDING_MODEL_FILE", "")
+EMBEDDING_COMPILE = os.getenv("EMBEDDING_COMPILE", "false").lower() in ("1", "true", "yes")
+
+# Thread pools for the encoder and for Faiss searches
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+FAISS_THREADS = int(os.getenv("FAISS_THREADS", str(os.cpu_count() or 1)))
 
 # Chunking settings
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 
+# Document loading settings
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", str(os.cpu_count() or 1)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1024"))
+INDEX_FLUSH_EVERY = int(os.getenv("INDEX_FLUSH_EVERY", "1000"))
+
 # Search settings
 TOP_K = int(os.getenv("TOP_K", "5"))
+ANN_THRESHOLD = int(os.getenv("ANN_THRESHOLD", "50000"))
 
 # Ollama settings
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
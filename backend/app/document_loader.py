@@ -2,41 +2,188 @@
 Document loaders for various file formats.
 Supports: PDF, Word, Excel, PowerPoint, Text, Markdown, CSV, JSON, HTML
 """
-import os
 import re
 import csv
 import json
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import markdown
+import pandas as pd
 from PyPDF2 import PdfReader
 from docx import Document as DocxDocument
 from openpyxl import load_workbook
 from pptx import Presentation
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # PyPDF2 remains the fallback extractor
+    pdfium = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # BeautifulSoup remains the fallback HTML parser
+    LexborHTMLParser = None
+
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:  # pandas' C parser remains the fallback CSV reader
+    pyarrow = None
+
+from app.config import LOADER_WORKERS
+
+# Compiled once at import; used to strip tags from rendered markdown.
+# [^>] cannot match the closing '>', so the scan never backtracks into a
+# tag and needs no possessive quantifier (which re only has from 3.11)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+logger = logging.getLogger(__name__)
+
+# Pages extracted per worker task; smaller PDFs are extracted in-process
+PDF_PAGES_PER_TASK = 16
+
+# PDFs below this size are always extracted in-process
+PDF_SMALL_BYTES = 50 * 1024
+
+# Total characters of converted text kept by _cached_convert
+TEXT_CACHE_CHARS = 32 * 1024 * 1024
+
+# Longer texts are not cached; a few of them would evict everything else
+TEXT_CACHE_MAX_ENTRY_CHARS = 2 * 1024 * 1024
+
+# Recently converted markdown/HTML texts, keyed by (format, content hash)
+_text_cache: "OrderedDict[Tuple[str, bytes], str]" = OrderedDict()
+_text_cache_chars = 0
+_text_cache_lock = threading.Lock()
+
+# Global process pool for CPU-bound extraction
+_pool: Optional[ProcessPoolExecutor] = None
+# Ingests run on several worker threads at once
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get or create the global extraction process pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawn rather than fork: the server process runs threads
+                # (torch, uvicorn) that are unsafe to fork
+                _pool = ProcessPoolExecutor(
+                    max_workers=LOADER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def _pdf_page_count(path: Path) -> int:
+    """Count the pages of a PDF without extracting any text."""
+    if pdfium is None:
+        return len(PdfReader(path).pages)
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _extract_pdf_pages(path: Path, first: int, last: int) -> List[str]:
+    """Extract text from pages [first, last) of a PDF."""
+    if pdfium is None:
+        reader = PdfReader(path)
+        return [reader.pages[i].extract_text() for i in range(first, last)]
+
+    # PDFium is not thread-safe, so parallelism comes from the process pool
+    pdf = pdfium.PdfDocument(path)
+    pages = []
+    try:
+        for i in range(first, last):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range().replace('\r\n', '\n'))
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+    return pages
+
+
+def _iter_pdf_text(path: Path, page_count: int) -> Iterator[str]:
+    """Extract every page, in a worker pool unless the PDF is small."""
+    if (
+        page_count <= PDF_PAGES_PER_TASK
+        or path.stat().st_size < PDF_SMALL_BYTES
+        or LOADER_WORKERS <= 1
+    ):
+        yield from _extract_pdf_pages(path, 0, page_count)
+        return
+
+    # Each worker reopens the file, so only paths and page numbers are
+    # pickled. Batches are consumed in page order, with at most one
+    # batch per worker extracted ahead of the consumer.
+    pool = get_process_pool()
+    pending = deque()
+    try:
+        for first in range(0, page_count, PDF_PAGES_PER_TASK):
+            last = min(first + PDF_PAGES_PER_TASK, page_count)
+            pending.append(pool.submit(_extract_pdf_pages, path, first, last))
+            if len(pending) > LOADER_WORKERS:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _iter_pdf(path: Path, page_count: int) -> Iterator[str]:
+    """Yield the non-empty page texts of a PDF."""
+    found_text = False
+    for page_text in _iter_pdf_text(path, page_count):
+        if page_text:
+            found_text = True
+            yield page_text
 
+    if not found_text:
+        logger.warning(
+            "%s: %d-page PDF has no text layer (scanned?); there is no OCR backend",
+            path.name, page_count
+        )
 
-def load_pdf(file_path: str) -> Tuple[str, dict]:
-    """Extract text from PDF file."""
-    reader = PdfReader(file_path)
-    text_parts = []
 
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text_parts.append(page_text)
+def iter_pdf(path: Path) -> Iterator[str]:
+    """Stream the text of a PDF file page by page."""
+    return _iter_pdf(path, _pdf_page_count(path))
 
-    return "\n\n".join(text_parts), {
+
+def load_pdf(path: Path, filename: str) -> Tuple[str, dict]:
+    """Extract text from PDF file."""
+    page_count = _pdf_page_count(path)
+    text = "\n\n".join(_iter_pdf(path, page_count))
+
+    return text, {
         "file_type": "pdf",
-        "page_count": len(reader.pages),
-        "filename": os.path.basename(file_path)
+        "page_count": page_count,
+        "filename": filename
     }
 
 
-def load_docx(file_path: str) -> Tuple[str, dict]:
+def load_docx(path: Path, filename: str) -> Tuple[str, dict]:
     """Extract text from Word document (.docx)."""
-    doc = DocxDocument(file_path)
+    doc = DocxDocument(path)
     text_parts = []
 
     # Extract paragraphs
@@ -54,40 +201,84 @@ def load_docx(file_path: str) -> Tuple[str, dict]:
     return "\n\n".join(text_parts), {
         "file_type": "docx",
         "paragraph_count": len(doc.paragraphs),
-        "filename": os.path.basename(file_path)
+        "filename": filename
     }
 
 
-def load_xlsx(file_path: str) -> Tuple[str, dict]:
-    """Extract text from Excel file (.xlsx)."""
-    wb = load_workbook(file_path, data_only=True)
-    text_parts = []
-    total_rows = 0
-
-    for sheet_name in wb.sheetnames:
-        sheet = wb[sheet_name]
-        text_parts.append(f"[Sheet: {sheet_name}]")
+def _iter_xlsx_sheet(path: Path, sheet_name: str) -> Iterator[str]:
+    """Yield a sheet header line followed by one line per non-empty row."""
+    wb = load_workbook(path, read_only=True, data_only=True)
 
-        for row in sheet.iter_rows():
-            row_values = []
-            for cell in row:
-                if cell.value is not None:
-                    row_values.append(str(cell.value))
+    try:
+        yield f"[Sheet: {sheet_name}]"
+        # values_only yields plain tuples instead of building Cell objects
+        for row in wb[sheet_name].iter_rows(values_only=True):
+            row_values = [str(value) for value in row if value is not None]
             if row_values:
-                text_parts.append(" | ".join(row_values))
-                total_rows += 1
+                yield " | ".join(row_values)
+    finally:
+        # Read-only workbooks keep the archive open until closed
+        wb.close()
+
+
+def _extract_xlsx_sheet(path: Path, sheet_name: str) -> List[str]:
+    """Extract the lines of one worksheet in a worker process."""
+    return list(_iter_xlsx_sheet(path, sheet_name))
+
+
+def _xlsx_sheet_names(path: Path) -> List[str]:
+    """List worksheet names without reading any rows."""
+    wb = load_workbook(path, read_only=True)
+    sheet_names = wb.sheetnames
+    wb.close()
+    return sheet_names
+
+
+def _iter_xlsx(path: Path, sheet_names: List[str]) -> Iterator[str]:
+    """Yield workbook lines, one sheet per worker for multi-sheet files."""
+    if len(sheet_names) <= 1 or LOADER_WORKERS <= 1:
+        for name in sheet_names:
+            yield from _iter_xlsx_sheet(path, name)
+        return
+
+    # Sheets are consumed in workbook order, with at most one sheet per
+    # worker extracted ahead of the consumer
+    pool = get_process_pool()
+    pending = deque()
+    try:
+        for name in sheet_names:
+            pending.append(pool.submit(_extract_xlsx_sheet, path, name))
+            if len(pending) > LOADER_WORKERS:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_xlsx(path: Path) -> Iterator[str]:
+    """Stream the text of an Excel file line by line."""
+    return _iter_xlsx(path, _xlsx_sheet_names(path))
+
+
+def load_xlsx(path: Path, filename: str) -> Tuple[str, dict]:
+    """Extract text from Excel file (.xlsx)."""
+    sheet_names = _xlsx_sheet_names(path)
+    text_parts = list(_iter_xlsx(path, sheet_names))
 
     return "\n".join(text_parts), {
         "file_type": "xlsx",
-        "sheet_count": len(wb.sheetnames),
-        "row_count": total_rows,
-        "filename": os.path.basename(file_path)
+        "sheet_count": len(sheet_names),
+        # Every sheet contributes one header line
+        "row_count": len(text_parts) - len(sheet_names),
+        "filename": filename
     }
 
 
-def load_pptx(file_path: str) -> Tuple[str, dict]:
+def load_pptx(path: Path, filename: str) -> Tuple[str, dict]:
     """Extract text from PowerPoint file (.pptx)."""
-    prs = Presentation(file_path)
+    prs = Presentation(path)
     text_parts = []
 
     for slide_num, slide in enumerate(prs.slides, 1):
@@ -101,104 +292,268 @@ def load_pptx(file_path: str) -> Tuple[str, dict]:
     return "\n\n".join(text_parts), {
         "file_type": "pptx",
         "slide_count": len(prs.slides),
-        "filename": os.path.basename(file_path)
+        "filename": filename
     }
 
 
-def load_markdown(file_path: str) -> Tuple[str, dict]:
+def _cached_convert(
+    kind: str,
+    content: bytes,
+    convert: Callable[[bytes], str]
+) -> str:
+    """
+    Convert file content to plain text, reusing earlier results.
+
+    Conversion is a pure function of the file bytes, so re-ingesting an
+    unchanged file skips parsing entirely.
+
+    Args:
+        kind: Format name, to keep caches of different converters apart
+        content: Raw file bytes
+        convert: Function producing plain text from the bytes
+
+    Returns:
+        Plain text content
+    """
+    global _text_cache_chars
+    key = (kind, hashlib.blake2b(content, digest_size=16).digest())
+
+    with _text_cache_lock:
+        if key in _text_cache:
+            _text_cache.move_to_end(key)
+            return _text_cache[key]
+
+    text = convert(content)
+    if len(text) > TEXT_CACHE_MAX_ENTRY_CHARS:
+        return text
+
+    with _text_cache_lock:
+        if key not in _text_cache:
+            _text_cache[key] = text
+            _text_cache_chars += len(text)
+        # Evict least recently used texts until back under the budget
+        while _text_cache_chars > TEXT_CACHE_CHARS:
+            _, evicted = _text_cache.popitem(last=False)
+            _text_cache_chars -= len(evicted)
+
+    return text
+
+
+def _markdown_to_text(content: bytes) -> str:
+    """Render markdown and strip the resulting tags."""
+    html = markdown.markdown(content.decode('utf-8'))
+    return _TAG_RE.sub('', html)
+
+
+def load_markdown(path: Path, filename: str) -> Tuple[str, dict]:
     """Load and convert markdown file to plain text."""
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(path, 'rb') as f:
         content = f.read()
 
-    html = markdown.markdown(content)
-    text = re.sub(r'<[^>]+>', '', html)
+    text = _cached_convert("markdown", content, _markdown_to_text)
 
     return text, {
         "file_type": "markdown",
-        "filename": os.path.basename(file_path)
+        "filename": filename
     }
 
 
-def load_text(file_path: str) -> Tuple[str, dict]:
+def load_text(path: Path, filename: str) -> Tuple[str, dict]:
     """Load plain text file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(path, 'r', encoding='utf-8') as f:
         content = f.read()
 
     return content, {
         "file_type": "text",
-        "filename": os.path.basename(file_path)
+        "filename": filename
     }
 
 
-def load_csv(file_path: str) -> Tuple[str, dict]:
-    """Extract text from CSV file."""
-    text_parts = []
-    row_count = 0
-
-    with open(file_path, 'r', encoding='utf-8') as f:
+def _iter_csv_rows(path: Path) -> Iterator[str]:
+    """Join CSV rows with the stdlib reader, which tolerates ragged rows."""
+    with open(path, 'r', encoding='utf-8') as f:
         reader = csv.reader(f)
         for row in reader:
             if any(cell.strip() for cell in row):
-                text_parts.append(" | ".join(cell.strip() for cell in row))
-                row_count += 1
+                yield " | ".join(cell.strip() for cell in row)
+
+
+def _iter_csv_arrow(path: Path) -> Iterator[str]:
+    """Join CSV rows with Arrow's streaming reader and compute kernels."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        # Width of the first row; Arrow skips blank lines as well
+        width = next((len(row) for row in csv.reader(f) if row), 0)
+    if width == 0:
+        return
+
+    yielded = 0
+    try:
+        # Every column is typed as a string up front; inferred types would
+        # rewrite cells such as 02134 or 1.50 before they reach the text
+        reader = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={f"f{i}": pyarrow.string() for i in range(width)},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False
+            )
+        )
+
+        # One record batch is held at a time
+        for batch in reader:
+            cells = [pc.utf8_trim_whitespace(column) for column in batch.columns]
+            rows = pc.binary_join_element_wise(*cells, " | ")
+            # A row is blank when its cells add nothing beyond the separators
+            non_blank = pc.greater(pc.binary_length(rows), len(" | ") * (width - 1))
+            lines = rows.filter(non_blank).to_pylist()
+            yield from lines
+            yielded += len(lines)
+    except pyarrow.ArrowInvalid:
+        # Ragged rows, which the Arrow reader rejects; the stdlib reader
+        # carries on after the rows already yielded
+        yield from islice(_iter_csv_rows(path), yielded, None)
+
+
+def iter_csv(path: Path) -> Iterator[str]:
+    """Stream the rows of a CSV file as text lines."""
+    if pyarrow is not None:
+        return _iter_csv_arrow(path)
+
+    try:
+        df = pd.read_csv(
+            path,
+            header=None,
+            dtype=str,
+            keep_default_na=False,
+            encoding='utf-8',
+            engine='c'
+        )
+    except pd.errors.EmptyDataError:
+        return iter(())
+    except pd.errors.ParserError:
+        # Rows with more fields than the first one
+        return _iter_csv_rows(path)
+
+    # The C parser pads short rows with empty cells, which cannot be told
+    # apart from real trailing empties; keep the csv module's rows then
+    if (df[df.columns[-1]].fillna('') == '').any():
+        return _iter_csv_rows(path)
+
+    cells = df.fillna('').apply(lambda col: col.str.strip())
+    cells = cells[(cells != '').any(axis=1)]
+    rows = cells[0].str.cat([cells[col] for col in cells.columns[1:]], sep=" | ")
+    return iter(rows.tolist())
+
+
+def load_csv(path: Path, filename: str) -> Tuple[str, dict]:
+    """Extract text from CSV file."""
+    text_parts = list(iter_csv(path))
 
     return "\n".join(text_parts), {
         "file_type": "csv",
-        "row_count": row_count,
-        "filename": os.path.basename(file_path)
+        "row_count": len(text_parts),
+        "filename": filename
     }
 
 
-def load_json(file_path: str) -> Tuple[str, dict]:
+def load_json(path: Path, filename: str) -> Tuple[str, dict]:
     """Extract text from JSON file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(path, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
-    def extract_text(obj, prefix=""):
-        """Recursively extract text from JSON structure."""
-        texts = []
+    # Iterative depth-first walk; children are pushed in reverse so lines
+    # come out in document order
+    text_lines = []
+    stack = deque([(data, "")])
+    while stack:
+        obj, prefix = stack.pop()
         if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_prefix = f"{prefix}.{key}" if prefix else key
-                texts.extend(extract_text(value, new_prefix))
+            stack.extend(
+                (value, f"{prefix}.{key}" if prefix else key)
+                for key, value in reversed(obj.items())
+            )
         elif isinstance(obj, list):
-            for i, item in enumerate(obj):
-                texts.extend(extract_text(item, f"{prefix}[{i}]"))
+            stack.extend(
+                (obj[i], f"{prefix}[{i}]") for i in range(len(obj) - 1, -1, -1)
+            )
         elif obj is not None:
-            texts.append(f"{prefix}: {obj}")
-        return texts
-
-    text_lines = extract_text(data)
+            text_lines.append(f"{prefix}: {obj}")
 
     return "\n".join(text_lines), {
         "file_type": "json",
-        "filename": os.path.basename(file_path)
+        "filename": filename
     }
 
 
-def load_html(file_path: str) -> Tuple[str, dict]:
-    """Extract text from HTML file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Elements the BeautifulSoup fallback does not build. bs4 only checks
+# parse_only against top-level tags, so the <html> and <head> wrappers are
+# rejected as well: their children are then checked one by one, skipping
+# head's scripts, styles and metadata tags while <title>, <noscript> and
+# <body> are built whole. Elements after </body> are kept, but bare text
+# lying directly in <html> (e.g. "after" in "</body>after</html>") is
+# dropped: a strainer that let top-level strings through would reject
+# every tag, and the text of a skipped <script> arrives as such a string
+# too. Scripts and styles in the body are still removed after parsing.
+_HTML_SKIPPED_TAGS = frozenset(['html', 'head', 'script', 'style', 'meta', 'link', 'base'])
+_HTML_STRAINER = SoupStrainer(lambda name, attrs=None: name not in _HTML_SKIPPED_TAGS)
 
-    soup = BeautifulSoup(content, 'lxml')
 
-    # Remove script and style elements
-    for script in soup(["script", "style"]):
-        script.decompose()
+def _html_to_text(content: bytes) -> str:
+    """Extract visible text from HTML, one line per text node."""
+    html = content.decode('utf-8')
+
+    if LexborHTMLParser is not None:
+        # Parse and walk the tree in C rather than through BeautifulSoup
+        tree = LexborHTMLParser(html)
+        for node in tree.css("script, style"):
+            node.decompose()
+        text = tree.root.text(separator='\n') if tree.root else ""
+    else:
+        soup = BeautifulSoup(html, 'lxml', parse_only=_HTML_STRAINER)
+
+        # Remove script and style elements inside the body
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        text = soup.get_text(separator='\n')
 
-    text = soup.get_text(separator='\n')
     # Clean up whitespace
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-    text = "\n".join(lines)
+    return "\n".join(filter(None, map(str.strip, text.splitlines())))
+
+
+def load_html(path: Path, filename: str) -> Tuple[str, dict]:
+    """Extract text from HTML file."""
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    text = _cached_convert("html", content, _html_to_text)
 
     return text, {
         "file_type": "html",
-        "filename": os.path.basename(file_path)
+        "filename": filename
     }
 
 
-def load_document(file_path: str) -> Tuple[str, dict]:
+# Loader for each supported extension
+_LOADERS: Dict[str, Callable[[Path, str], Tuple[str, dict]]] = {
+    '.pdf': load_pdf,
+    '.docx': load_docx,
+    '.xlsx': load_xlsx,
+    '.pptx': load_pptx,
+    '.md': load_markdown,
+    '.markdown': load_markdown,
+    '.txt': load_text,
+    '.text': load_text,
+    '.csv': load_csv,
+    '.json': load_json,
+    '.html': load_html,
+    '.htm': load_html,
+}
+
+
+def load_document(file_path: Union[str, Path]) -> Tuple[str, dict]:
     """
     Load document based on file extension.
 
@@ -220,28 +575,52 @@ def load_document(file_path: str) -> Tuple[str, dict]:
         ValueError: If file type is not supported
     """
     path = Path(file_path)
+    filename = path.name
     extension = path.suffix.lower()
 
-    loaders = {
-        '.pdf': load_pdf,
-        '.docx': load_docx,
-        '.xlsx': load_xlsx,
-        '.pptx': load_pptx,
-        '.md': load_markdown,
-        '.markdown': load_markdown,
-        '.txt': load_text,
-        '.text': load_text,
-        '.csv': load_csv,
-        '.json': load_json,
-        '.html': load_html,
-        '.htm': load_html,
-    }
-
-    if extension not in loaders:
-        supported = list(loaders.keys())
+    if extension not in _LOADERS:
+        supported = list(_LOADERS.keys())
         raise ValueError(f"Unsupported file type: {extension}. Supported formats: {supported}")
 
-    return loaders[extension](file_path)
+    return _LOADERS[extension](path, filename)
+
+
+def _interleave(parts: Iterable[str], separator: str) -> Iterator[str]:
+    """Yield parts with separator between them, like str.join."""
+    for i, part in enumerate(parts):
+        if i:
+            yield separator
+        yield part
+
+
+# Streaming readers and the separator their load_* counterpart joins with
+_STREAMERS: Dict[str, Tuple[Callable[[Path], Iterator[str]], str]] = {
+    '.pdf': (iter_pdf, "\n\n"),
+    '.xlsx': (iter_xlsx, "\n"),
+    '.csv': (iter_csv, "\n"),
+}
+
+
+def iter_document(file_path: Union[str, Path]) -> Iterator[str]:
+    """
+    Stream a document's text in parts, based on file extension.
+
+    PDF, Excel and CSV files are read incrementally; other formats are
+    loaded whole and yielded as a single part. Joining the parts gives the
+    same text as load_document.
+
+    Raises:
+        ValueError: If file type is not supported
+    """
+    path = Path(file_path)
+    extension = path.suffix.lower()
+
+    if extension in _STREAMERS:
+        streamer, separator = _STREAMERS[extension]
+        return _interleave(streamer(path), separator)
+
+    text, _ = load_document(path)
+    return iter((text,))
 
 
 def get_supported_extensions() -> list:
@@ -4,10 +4,19 @@ Uses Ollama for local LLM inference (Mistral, Llama2, etc.)
 """
 import os
 import httpx
+import orjson
 from typing import List, Dict, Any, Generator, AsyncGenerator
 
 from app.config import OLLAMA_BASE_URL, OLLAMA_MODEL
 
+# Static start of every prompt, built once. It comes before anything
+# query-specific so Ollama can reuse its cached prefix between requests.
+PROMPT_PREFIX = """You are a helpful assistant that answers questions based on the provided context.
+Use only the information from the context to answer. If the answer cannot be found in the context, say so clearly.
+
+Context:
+"""
+
 
 class AnswerGenerator:
     """
@@ -25,6 +34,20 @@ class AnswerGenerator:
         self.base_url = base_url.rstrip('/')
         self.model = model
 
+        # Long-lived clients keep connections to Ollama alive across calls
+        limits = httpx.Limits(max_keepalive_connections=32)
+        self._client = httpx.Client(
+            base_url=self.base_url, timeout=120.0, limits=limits
+        )
+        self._aclient = httpx.AsyncClient(
+            base_url=self.base_url, timeout=120.0, limits=limits
+        )
+
+    async def aclose(self):
+        """Close both HTTP clients."""
+        self._client.close()
+        await self._aclient.aclose()
+
     def _build_prompt(self, query: str, passages: List[Dict[str, Any]]) -> str:
         """Build the prompt with context from retrieved passages."""
         if not passages:
@@ -37,11 +60,7 @@ class AnswerGenerator:
 
         context = "\n\n".join(context_parts)
 
-        return f"""You are a helpful assistant that answers questions based on the provided context.
-Use only the information from the context to answer. If the answer cannot be found in the context, say so clearly.
-
-Context:
-{context}
+        return f"""{PROMPT_PREFIX}{context}
 
 Question: {query}
 
@@ -67,21 +86,20 @@ Answer:"""
         prompt = self._build_prompt(query, passages)
 
         try:
-            with httpx.Client(timeout=120.0) as client:
-                response = client.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "num_predict": max_tokens,
-                            "temperature": 0.7,
-                        }
+            response = self._client.post(
+                "/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": False,
+                    "options": {
+                        "num_predict": max_tokens,
+                        "temperature": 0.7,
                     }
-                )
-                response.raise_for_status()
-                return response.json().get("response", "Failed to generate response.")
+                }
+            )
+            response.raise_for_status()
+            return response.json().get("response", "Failed to generate response.")
         except httpx.ConnectError:
             return "Error: Cannot connect to Ollama. Please ensure Ollama is running."
         except Exception as e:
@@ -107,29 +125,27 @@ Answer:"""
         prompt = self._build_prompt(query, passages)
 
         try:
-            with httpx.Client(timeout=120.0) as client:
-                with client.stream(
-                    "POST",
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": True,
-                        "options": {
-                            "num_predict": max_tokens,
-                            "temperature": 0.7,
-                        }
+            with self._client.stream(
+                "POST",
+                "/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": True,
+                    "options": {
+                        "num_predict": max_tokens,
+                        "temperature": 0.7,
                     }
-                ) as response:
-                    response.raise_for_status()
-                    for line in response.iter_lines():
-                        if line:
-                            import json
-                            data = json.loads(line)
-                            if "response" in data:
-                                yield data["response"]
-                            if data.get("done", False):
-                                break
+                }
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        data = orjson.loads(line)
+                        if "response" in data:
+                            yield data["response"]
+                        if data.get("done", False):
+                            break
         except httpx.ConnectError:
             yield "Error: Cannot connect to Ollama. Please ensure Ollama is running."
         except Exception as e:
@@ -155,29 +171,27 @@ Answer:"""
         prompt = self._build_prompt(query, passages)
 
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": True,
-                        "options": {
-                            "num_predict": max_tokens,
-                            "temperature": 0.7,
-                        }
+            async with self._aclient.stream(
+                "POST",
+                "/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": True,
+                    "options": {
+                        "num_predict": max_tokens,
+                        "temperature": 0.7,
                     }
-                ) as response:
-                    response.raise_for_status()
-                    async for line in response.aiter_lines():
-                        if line:
-                            import json
-                            data = json.loads(line)
-                            if "response" in data:
-                                yield data["response"]
-                            if data.get("done", False):
-                                break
+                }
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        data = orjson.loads(line)
+                        if "response" in data:
+                            yield data["response"]
+                        if data.get("done", False):
+                            break
         except httpx.ConnectError:
             yield "Error: Cannot connect to Ollama. Please ensure Ollama is running."
         except Exception as e:
@@ -194,3 +208,11 @@ def get_generator() -> AnswerGenerator:
     if _generator is None:
         _generator = AnswerGenerator()
     return _generator
+
+
+async def close_generator():
+    """Close the global generator's HTTP clients, if it was created."""
+    global _generator
+    if _generator is not None:
+        await _generator.aclose()
+        _generator = None
@@ -1,21 +1,26 @@
 """
 FastAPI application for the RAG web service.
 """
-import os
-import tempfile
-from typing import List, Optional
+import io
+import json
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+import aiofiles
+import aiofiles.os
+import aiofiles.tempfile
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.config import DATA_DIR
-from app.document_loader import load_document, get_supported_extensions
-from app.chunker import chunk_text
-from app.vector_store import get_vector_store
-from app.generator import get_generator
+from app.config import DATA_DIR, TOP_K
+from app.document_loader import load_document, iter_document, get_supported_extensions
+from app.chunker import chunk_text_stream, chunk_texts_batch
+from app.vector_store import VectorStore, get_vector_store
+from app.generator import get_generator, close_generator
 
 
 # Pydantic models for request/response
@@ -42,12 +47,165 @@ class IngestResponse(BaseModel):
     chunks_added: int
 
 
+class BatchIngestResponse(BaseModel):
+    message: str
+    filenames: List[str]
+    chunks_added: int
+
+
 class StatsResponse(BaseModel):
     total_documents: int
     embedding_dimension: int
     model_name: str
 
 
+# Bytes read from an upload per await
+UPLOAD_READ_SIZE = 1 << 20
+
+
+async def _save_upload(file: UploadFile, suffix: str) -> str:
+    """Stream an upload to a temporary file without blocking the event loop."""
+    async with aiofiles.tempfile.NamedTemporaryFile('wb', delete=False, suffix=suffix) as tmp:
+        while chunk := await file.read(UPLOAD_READ_SIZE):
+            await tmp.write(chunk)
+        return tmp.name
+
+
+def _ingest_file(store: VectorStore, tmp_path: str, filename: str) -> int:
+    """Load, chunk and index one file; blocking, run on a worker thread."""
+    # Stream the document through the chunker so only a window of
+    # text is held in memory
+    parts = iter_document(tmp_path)
+    chunks = chunk_text_stream(parts, source=filename)
+
+    # Added batch by batch as the text arrives; a failed ingest is rolled
+    # back, so it leaves nothing behind
+    return store.add_chunk_stream(chunks)
+
+
+def _ingest_files(store: VectorStore, tmp_paths: List[str], filenames: List[str]) -> int:
+    """Load every file, then chunk and index them as one batch."""
+    docs = [
+        (load_document(tmp_path)[0], filename)
+        for tmp_path, filename in zip(tmp_paths, filenames)
+    ]
+    return store.add_batch(chunk_texts_batch(docs))
+
+
+# Queries waiting for the next batched index search
+_search_queue: List[Tuple[str, int, asyncio.Future]] = []
+_search_worker: Optional[asyncio.Task] = None
+
+
+async def _search(query: str, top_k: Optional[int]) -> List[dict]:
+    """
+    Search the vector store without blocking the event loop.
+
+    Queries that arrive while a search is running are answered together
+    by a single search_many call when it finishes, so concurrent requests
+    share one encode and one index search without waiting on a timer.
+    """
+    global _search_worker
+    future = asyncio.get_running_loop().create_future()
+    _search_queue.append((query, top_k or TOP_K, future))
+    if _search_worker is None:
+        _search_worker = asyncio.create_task(_drain_search_queue())
+    return await future
+
+
+async def _drain_search_queue():
+    """Run queued searches in batches until the queue is empty."""
+    global _search_worker
+    try:
+        # Creating the store can load the model or rebuild the index
+        store = await asyncio.to_thread(get_vector_store)
+    except Exception as e:
+        # Fail every queued search rather than leave it waiting forever
+        for _, _, future in _search_queue:
+            if not future.done():
+                future.set_exception(e)
+        _search_queue.clear()
+        _search_worker = None
+        return
+
+    try:
+        while _search_queue:
+            batch = _search_queue[:]
+            _search_queue.clear()
+
+            # FAISS search is blocking; run it on a worker thread
+            top_k = max(k for _, k, _ in batch)
+            try:
+                results = await asyncio.to_thread(
+                    store.search_many, [query for query, _, _ in batch], top_k
+                )
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, k, future), hits in zip(batch, results):
+                if not future.done():
+                    future.set_result(hits[:k])
+    finally:
+        _search_worker = None
+
+
+@dataclass
+class _SharedAnswer:
+    """A search-and-answer task and the number of requests awaiting it."""
+    task: asyncio.Task
+    waiters: int = 0
+
+
+# Searches in flight, keyed by (query, top_k)
+_inflight: Dict[Tuple[str, Optional[int]], _SharedAnswer] = {}
+
+
+async def _search_and_answer(query: str, top_k: Optional[int]) -> Tuple[List[dict], str]:
+    """
+    Retrieve passages and generate an answer without blocking the event loop.
+
+    Concurrent calls with the same query and top_k share a single search
+    and LLM call.
+
+    Returns:
+        Tuple of (search results, generated answer)
+    """
+    key = (query, top_k)
+
+    # No await between the lookup and the insert, so this check-and-set
+    # cannot interleave with another request on the event loop
+    shared = _inflight.get(key)
+    if shared is None:
+        shared = _inflight[key] = _SharedAnswer(asyncio.create_task(_answer(query, top_k)))
+    shared.waiters += 1
+
+    try:
+        # The work runs in its own task; shield it so one caller
+        # disconnecting does not cancel it for the others
+        return await asyncio.shield(shared.task)
+    finally:
+        shared.waiters -= 1
+        if shared.waiters == 0:
+            del _inflight[key]
+            # The last caller left before the answer was ready
+            shared.task.cancel()
+
+
+async def _answer(query: str, top_k: Optional[int]) -> Tuple[List[dict], str]:
+    """Search and generate the full answer for one query."""
+    generator = get_generator()
+    results = await _search(query, top_k)
+
+    answer = io.StringIO()
+    async for piece in generator.generate_stream_async(query, results):
+        answer.write(piece)
+
+    return results, answer.getvalue()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Semantic RAG API",
@@ -65,6 +223,12 @@ app.add_middleware(
 )
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Release pooled connections to Ollama."""
+    await close_generator()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -74,8 +238,10 @@ async def root():
 @app.get("/stats", response_model=StatsResponse)
 async def get_stats():
     """Get vector store statistics."""
-    store = get_vector_store()
-    return store.get_stats()
+    # Creating the store can load the model or rebuild the index, and
+    # reading the embedding dimension may load the model
+    store = await asyncio.to_thread(get_vector_store)
+    return await asyncio.to_thread(store.get_stats)
 
 
 @app.get("/formats")
@@ -103,22 +269,13 @@ async def ingest_document(file: UploadFile = File(...)):
         )
 
     # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    tmp_path = await _save_upload(file, file_ext)
 
     try:
-        # Load and process document
-        text, metadata = load_document(tmp_path)
-        metadata["original_filename"] = file.filename
-
-        # Chunk the document
-        chunks = chunk_text(text, source=file.filename)
-
-        # Add to vector store
-        store = get_vector_store()
-        chunks_added = store.add_chunks(chunks)
+        # Parsing, chunking and embedding are CPU-bound; keep them off the
+        # event loop so searches stay responsive during large ingests
+        store = await asyncio.to_thread(get_vector_store)
+        chunks_added = await asyncio.to_thread(_ingest_file, store, tmp_path, file.filename)
 
         return IngestResponse(
             message="Document ingested successfully",
@@ -131,7 +288,51 @@ async def ingest_document(file: UploadFile = File(...)):
 
     finally:
         # Clean up temp file
-        os.unlink(tmp_path)
+        await aiofiles.os.remove(tmp_path)
+
+
+@app.post("/ingest/batch", response_model=BatchIngestResponse)
+async def ingest_documents(files: List[UploadFile] = File(...)):
+    """
+    Ingest several documents at once.
+
+    All files are chunked together and embedded in a single pass, which
+    is cheaper than one /ingest call per file for many small documents.
+    """
+    # Validate every file extension before doing any work
+    allowed_extensions = set(get_supported_extensions())
+    for file in files:
+        file_ext = Path(file.filename).suffix.lower()
+        if file_ext not in allowed_extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file type: {file_ext} ({file.filename}). Supported: {sorted(allowed_extensions)}"
+            )
+
+    # Save uploaded files temporarily
+    tmp_paths = []
+    try:
+        for file in files:
+            tmp_paths.append(await _save_upload(file, Path(file.filename).suffix.lower()))
+
+        store = await asyncio.to_thread(get_vector_store)
+        chunks_added = await asyncio.to_thread(
+            _ingest_files, store, tmp_paths, [file.filename for file in files]
+        )
+
+        return BatchIngestResponse(
+            message="Documents ingested successfully",
+            filenames=[file.filename for file in files],
+            chunks_added=chunks_added
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        # Clean up temp files
+        for tmp_path in tmp_paths:
+            await aiofiles.os.remove(tmp_path)
 
 
 @app.post("/search", response_model=SearchResponse)
@@ -142,14 +343,7 @@ async def search(request: SearchRequest):
     Performs semantic search on ingested documents and generates
     an answer based on the retrieved passages.
     """
-    store = get_vector_store()
-    generator = get_generator()
-
-    # Search for relevant passages
-    results = store.search(request.query, top_k=request.top_k)
-
-    # Generate answer
-    answer = generator.generate(request.query, results)
+    results, answer = await _search_and_answer(request.query, request.top_k)
 
     return SearchResponse(
         query=request.query,
@@ -165,30 +359,31 @@ async def search_stream(request: SearchRequest):
 
     Returns results immediately, then streams the answer generation.
     """
-    store = get_vector_store()
     generator = get_generator()
 
     # Search for relevant passages
-    results = store.search(request.query, top_k=request.top_k)
+    results = await _search(request.query, request.top_k)
 
     async def generate_stream():
         # First yield the search results as JSON
-        import json
         yield json.dumps({"results": results}) + "\n---ANSWER---\n"
 
         # Then stream the answer
-        for chunk in generator.generate_stream(request.query, results):
+        async for chunk in generator.generate_stream_async(request.query, results):
             yield chunk
 
     return StreamingResponse(
         generate_stream(),
-        media_type="text/plain"
+        media_type="text/plain",
+        # Ask reverse proxies (nginx) not to buffer the token stream
+        headers={"X-Accel-Buffering": "no"}
     )
 
 
 @app.delete("/clear")
 async def clear_index():
     """Clear all documents from the vector store."""
-    store = get_vector_store()
-    store.clear()
+    store = await asyncio.to_thread(get_vector_store)
+    # Waits for the store lock, which an ingest holds while it flushes
+    await asyncio.to_thread(store.clear)
     return {"message": "Index cleared successfully"}
@@ -2,17 +2,72 @@
 FAISS-based vector store for semantic search.
 """
 import os
-import json
+import atexit
+import hashlib
 import pickle
-from typing import List, Dict, Any, Optional
+import sqlite3
+import logging
+import threading
+from functools import cached_property
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from pathlib import Path
 
 import numpy as np
+import orjson
 import faiss
+import torch
 from sentence_transformers import SentenceTransformer
 
-from app.config import INDEX_DIR, EMBEDDING_MODEL, TOP_K
-from app.chunker import Chunk
+try:
+    import onnxruntime as ort
+except ImportError:  # only needed for the onnx backend
+    ort = None
+
+from app.config import (
+    INDEX_DIR, EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_MODEL_FILE, EMBEDDING_COMPILE, TOP_K, ANN_THRESHOLD,
+    EMBEDDING_THREADS, FAISS_THREADS, INDEX_FLUSH_EVERY, INGEST_BATCH_SIZE
+)
+from app.chunker import Chunk, ChunkBatch
+
+logger = logging.getLogger(__name__)
+
+# Size the encoder and Faiss thread pools explicitly instead of relying
+# on whatever the container's environment implies
+torch.set_num_threads(EMBEDDING_THREADS)
+faiss.omp_set_num_threads(FAISS_THREADS)
+
+
+def _check_simd_build():
+    """Warn if Faiss loaded a build without the CPU's widest SIMD kernels."""
+    supported = faiss.supported_instruction_sets()
+    compiled = faiss.get_compile_options().split()
+    for level, flag in (("AVX512", "AVX512F"), ("AVX2", "AVX2")):
+        if flag in supported:
+            if level not in compiled:
+                logger.warning(
+                    "CPU supports %s but Faiss loaded a build with %s; inner-product "
+                    "scans will be slower. Install a faiss-cpu wheel with %s kernels "
+                    "or set FAISS_OPT_LEVEL.",
+                    level, " ".join(compiled) or "no SIMD options", level
+                )
+            return
+
+
+_check_simd_build()
+
+# HNSW graph parameters for the approximate index
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Number of query embeddings kept for repeated searches
+QUERY_CACHE_SIZE = 4096
+
+# Flat indexes at least this large are scanned in FAISS_THREADS slices
+PARALLEL_SCAN_MIN = 16384
 
 
 class VectorStore:
@@ -20,40 +75,334 @@ class VectorStore:
     FAISS vector store with sentence transformer embeddings.
     """
 
-    def __init__(self, model_name: str = EMBEDDING_MODEL):
+    def __init__(self, model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND):
         """
         Initialize the vector store.
 
         Args:
             model_name: Name of the sentence transformer model
+            backend: Inference backend: "torch", "onnx" or "openvino"
         """
-        self.model = SentenceTransformer(model_name)
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
-        self.index: Optional[faiss.IndexFlatIP] = None
-        self.documents: List[Dict[str, Any]] = []
+        # The model is loaded on first use; see the model property
+        self.model_name = model_name
+        self.backend = backend
+        self._model_lock = threading.Lock()
         self.index_path = INDEX_DIR / "faiss.index"
+        # Documents stay in SQLite, keyed by index position, and only the
+        # rows of search hits are read back
+        self.db_path = INDEX_DIR / "documents.db"
+        # Written by earlier versions; migrated to db_path on load
         self.docs_path = INDEX_DIR / "documents.pkl"
 
+        # Searches cover the on-disk index, memory-mapped and never modified
+        # in place, plus an in-memory delta of vectors added since the last
+        # flush. Flushing folds the delta into a new file and remaps it.
+        self._base: Optional[faiss.Index] = None
+        self._delta: faiss.Index = self._new_index()
+
+        # With a GPU build of Faiss and a visible device, searches of the
+        # base go to an exact copy of it in GPU memory
+        self._gpu_resources = faiss.StandardGpuResources() if faiss.get_num_gpus() > 0 else None
+        self._base_gpu: Optional[faiss.Index] = None
+
+        # Text digest -> id of the first vector embedding that text
+        self._hash_to_id: Dict[bytes, int] = {}
+
+        # Guards the index and documents; ingest and search run on worker
+        # threads. Encoding happens outside the lock.
+        self._lock = threading.Lock()
+        # Held by writers; a streamed ingest keeps it until it finishes so
+        # that its vectors stay contiguous and can be rolled back
+        self._ingest_lock = threading.RLock()
+
+        # Recent query embeddings, keyed by whitespace-normalized query
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        # Per-thread scratch matrix the query embeddings are gathered into
+        self._query_buffers = threading.local()
+
+        # Threads that each scan one slice of a large flat index
+        self._scan_pool = ThreadPoolExecutor(FAISS_THREADS) if FAISS_THREADS > 1 else None
+
         # Load existing index if available
         self._load_index()
+        atexit.register(self.flush)
+
+    @cached_property
+    def model(self) -> SentenceTransformer:
+        """The embedding model, loaded on first access."""
+        # A process that only serves an existing index does not pay for
+        # the model until the first query arrives
+        with self._model_lock:
+            if "model" in self.__dict__:
+                return self.__dict__["model"]
+
+            # ONNX Runtime and OpenVINO run an optimized graph instead of eager
+            # PyTorch. Models without an exported file are converted on load.
+            model_kwargs = {}
+            if self.backend != "torch" and EMBEDDING_MODEL_FILE:
+                model_kwargs["file_name"] = EMBEDDING_MODEL_FILE
+            if self.backend == "onnx" and ort is not None:
+                session_options = ort.SessionOptions()
+                session_options.intra_op_num_threads = EMBEDDING_THREADS
+                model_kwargs["session_options"] = session_options
+            elif self.backend == "openvino":
+                model_kwargs["ov_config"] = {"INFERENCE_NUM_THREADS": EMBEDDING_THREADS}
+            model = SentenceTransformer(self.model_name, backend=self.backend, model_kwargs=model_kwargs or None)
+            if self.backend == "torch" and model.device.type == "cuda":
+                # fp16 roughly doubles encode throughput on GPU; embeddings are
+                # still cast to fp32 before they reach Faiss
+                model.half()
+            if self.backend == "torch" and EMBEDDING_COMPILE:
+                self._compile(model)
+            return model
+
+    @staticmethod
+    def _compile(model: SentenceTransformer):
+        """Compile the transformer forward pass, keeping eager mode on failure."""
+        # Cuts Python dispatch overhead per layer, which dominates the
+        # encode time of short queries
+        auto_model = model[0].auto_model
+        try:
+            auto_model.forward = torch.compile(auto_model.forward, mode="reduce-overhead", dynamic=True)
+            # Compilation happens on the first call; do it now rather than
+            # during the first request
+            model.encode(["warm up"])
+        except Exception as e:
+            logger.warning("torch.compile failed, using the eager model: %s", e)
+            # Drop the instance attribute so the class forward is used again
+            auto_model.__dict__.pop("forward", None)
+
+    @cached_property
+    def embedding_dim(self) -> int:
+        """Dimension of the stored embeddings."""
+        # Read from the saved index when there is one so that opening a
+        # store does not load the model
+        if self.index_path.exists():
+            return faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY).d
+        return self.model.get_sentence_embedding_dimension()
 
     def _load_index(self):
         """Load existing index from disk if available."""
-        if self.index_path.exists() and self.docs_path.exists():
-            self.index = faiss.read_index(str(self.index_path))
-            with open(self.docs_path, 'rb') as f:
-                self.documents = pickle.load(f)
-        else:
-            # Create new index (Inner Product for cosine similarity with normalized vectors)
-            self.index = faiss.IndexFlatIP(self.embedding_dim)
-            self.documents = []
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, text TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, chunk_index INTEGER NOT NULL)"
+        )
+        if self.docs_path.exists():
+            self._migrate_pickle()
+
+        if self.index_path.exists():
+            self._set_base(self._map_index())
+
+        # Rows are committed before the index is flushed; embed the ones
+        # whose vectors were lost when the process last stopped again
+        self._recover_unflushed()
+        count = 0
+        for i, text in self._db.execute("SELECT id, text FROM documents ORDER BY id"):
+            self._hash_to_id.setdefault(_text_hash(text), i)
+            count += 1
+
+        if count < self.ntotal:
+            logger.warning(
+                "Index has %d vectors but only %d documents; starting empty",
+                self.ntotal, count
+            )
+            self._set_base(None)
+            self.index_path.unlink()
+            self._db.execute("DELETE FROM documents")
+            self._db.commit()
+            self._hash_to_id = {}
+
+        # Indexes saved before the corpus outgrew exact search
+        if self._base is not None and self._needs_upgrade(self._base):
+            self._save_index()
+
+    def _recover_unflushed(self):
+        """Re-embed the document rows added after the last index flush."""
+        rows = self._db.execute(
+            "SELECT id, text FROM documents WHERE id >= ? ORDER BY id", (self.ntotal,)
+        ).fetchall()
+        if not rows:
+            return
+
+        # Rows are appended contiguously; anything past a gap has no place
+        # in the index
+        contiguous = 0
+        while contiguous < len(rows) and rows[contiguous][0] == self.ntotal + contiguous:
+            contiguous += 1
+        if contiguous < len(rows):
+            logger.warning("Dropping %d documents with no index position", len(rows) - contiguous)
+            self._db.execute("DELETE FROM documents WHERE id >= ?", (rows[contiguous][0],))
+            self._db.commit()
+
+        logger.info("Re-embedding %d documents added after the last index flush", contiguous)
+        for start in range(0, contiguous, INGEST_BATCH_SIZE):
+            batch = rows[start:min(start + INGEST_BATCH_SIZE, contiguous)]
+            self._delta.add(self._embed([text for _, text in batch]))
+
+    @property
+    def ntotal(self) -> int:
+        """Number of vectors in the store."""
+        return (self._base.ntotal if self._base is not None else 0) + self._delta.ntotal
+
+    def _map_index(self) -> faiss.Index:
+        """Open the index file read-only, memory-mapped where Faiss supports it."""
+        # Mapped pages live in the page cache and are read on demand
+        # instead of being copied onto the heap
+        index = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    def _set_base(self, index: Optional[faiss.Index]):
+        """Replace the base index and its GPU copy."""
+        self._base = index
+        self._base_gpu = self._gpu_copy(index)
+
+    def _gpu_copy(self, index: Optional[faiss.Index]) -> Optional[faiss.Index]:
+        """Copy an index to the GPU, if there is one."""
+        if index is None or self._gpu_resources is None:
+            return None
+
+        # cuBLAS brute force beats a CPU graph walk, so HNSW bases are
+        # decoded into a flat index before the copy
+        if not isinstance(index, faiss.IndexFlat):
+            flat = self._new_index()
+            flat.add(index.reconstruct_n(0, index.ntotal))
+            index = flat
+        return faiss.index_cpu_to_gpu(self._gpu_resources, 0, index)
+
+    def _migrate_pickle(self):
+        """Move documents from the pickle used by earlier versions into SQLite."""
+        with open(self.docs_path, 'rb') as f:
+            documents = pickle.load(f)
+        self._db.execute("DELETE FROM documents")
+        self._insert_documents(
+            0,
+            [doc["text"] for doc in documents],
+            [doc["metadata"] for doc in documents],
+            [doc["chunk_index"] for doc in documents]
+        )
+        self.docs_path.unlink()
+
+    def _insert_documents(
+        self,
+        first_id: int,
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        chunk_indices: Iterable[int],
+        commit: bool = True
+    ):
+        """
+        Append document rows, numbered from their first index position.
+
+        With commit=False the rows stay in the open transaction, visible
+        to this connection only, until the caller commits or rolls back.
+        """
+        try:
+            self._db.executemany(
+                "INSERT INTO documents (id, text, metadata, chunk_index) VALUES (?, ?, ?, ?)",
+                zip(
+                    range(first_id, first_id + len(texts)),
+                    texts,
+                    map(_dump_metadata, metadata),
+                    map(int, chunk_indices)
+                )
+            )
+        except BaseException:
+            # Drop the rows inserted before the failure
+            self._db.rollback()
+            raise
+        if commit:
+            self._db.commit()
+
+    def _fetch_documents(self, ids: Iterable[int]) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        """Read the text and metadata of the given documents."""
+        ids = list(set(ids))
+        documents = {}
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._db.execute(
+                "SELECT id, text, metadata FROM documents WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                chunk
+            )
+            # Rows written by earlier versions hold JSON text, which orjson
+            # reads just as well as the bytes it writes
+            for i, text, metadata in rows:
+                documents[i] = (text, orjson.loads(metadata))
+        return documents
+
+    def _new_index(self) -> faiss.Index:
+        """Create an empty exact index."""
+        # Inner Product for cosine similarity with normalized vectors
+        return faiss.IndexFlatIP(self.embedding_dim)
+
+    def _needs_upgrade(self, index: faiss.Index) -> bool:
+        """Whether an index has outgrown its type; see _upgrade_index."""
+        return not isinstance(index, faiss.IndexHNSWSQ) and index.ntotal >= ANN_THRESHOLD
+
+    def _upgrade_index(self, index: faiss.Index) -> faiss.Index:
+        """
+        Rebuild an index as quantized HNSW once it reaches ANN_THRESHOLD vectors.
+
+        Exact search scans every vector per query; the HNSW graph visits
+        a small neighbourhood instead. Vectors are stored as 8-bit codes,
+        a quarter of the fp32 size, with per-dimension ranges trained on
+        the vectors already in the index.
+
+        Returns:
+            The rebuilt index, or the given one if it does not need it
+        """
+        if not self._needs_upgrade(index):
+            return index
+
+        vectors = index.reconstruct_n(0, index.ntotal)
+        upgraded = faiss.IndexHNSWSQ(
+            self.embedding_dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        upgraded.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        upgraded.hnsw.efSearch = HNSW_EF_SEARCH
+        upgraded.train(vectors)
+        upgraded.add(vectors)
+        return upgraded
 
     def _save_index(self):
-        """Save index to disk."""
-        if self.index is not None:
-            faiss.write_index(self.index, str(self.index_path))
-            with open(self.docs_path, 'wb') as f:
-                pickle.dump(self.documents, f)
+        """
+        Fold the delta into the index file and remap it.
+
+        Called with _ingest_lock held, which keeps other writers out. The
+        new index is built and written without holding _lock, so searches
+        keep running against the current base and delta meanwhile.
+        """
+        with self._lock:
+            folded = self._delta.ntotal
+            vectors = self._delta.reconstruct_n(0, folded) if folded else None
+
+        # The mapped base cannot grow, so rebuild from a private copy
+        if self.index_path.exists():
+            index = faiss.read_index(str(self.index_path))
+        else:
+            index = self._new_index()
+        if vectors is not None:
+            index.add(vectors)
+        index = self._upgrade_index(index)
+
+        # Write beside the old file and swap, so a crash mid-write leaves
+        # the previous index intact and existing mappings stay valid
+        tmp_path = self.index_path.with_suffix(".tmp")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+        base = self._map_index()
+        base_gpu = self._gpu_copy(base)
+
+        with self._lock:
+            self._base, self._base_gpu = base, base_gpu
+            self._delta.remove_ids(faiss.IDSelectorRange(0, folded))
 
     def add_chunks(self, chunks: List[Chunk]) -> int:
         """
@@ -68,25 +417,196 @@ class VectorStore:
         if not chunks:
             return 0
 
-        # Generate embeddings
-        texts = [chunk.text for chunk in chunks]
-        embeddings = self.model.encode(texts, normalize_embeddings=True)
+        return self._add(
+            [chunk.text for chunk in chunks],
+            [chunk.metadata for chunk in chunks],
+            [chunk.chunk_index for chunk in chunks]
+        )
+
+    def add_chunk_stream(self, chunks: Iterable[Chunk], batch_size: int = INGEST_BATCH_SIZE) -> int:
+        """
+        Add a stream of chunks, all or none.
+
+        Each batch is embedded and appended as the stream produces it, so
+        only one batch is held in memory. The document rows are committed
+        in one transaction once the stream ends; if it raises (e.g. on a
+        corrupt page), the chunks it already added are removed again, and
+        if the process dies first, none of its rows survive the restart.
+
+        Args:
+            chunks: Chunk objects, typically from chunk_text_stream
+            batch_size: Chunks embedded per encode call
+
+        Returns:
+            Number of chunks added
+        """
+        added = 0
+        chunks = iter(chunks)
+        with self._ingest_lock:
+            first_id = self.ntotal
+            try:
+                while batch := list(islice(chunks, batch_size)):
+                    texts = [chunk.text for chunk in batch]
+                    hashes = [_text_hash(text) for text in texts]
+                    self._append(
+                        texts,
+                        [chunk.metadata for chunk in batch],
+                        [chunk.chunk_index for chunk in batch],
+                        hashes,
+                        self._vectors(texts, hashes),
+                        flush=False,
+                        commit=False
+                    )
+                    added += len(batch)
+                self._db.commit()
+            except BaseException:
+                self._truncate(first_id)
+                raise
+
+            if self._delta.ntotal >= INDEX_FLUSH_EVERY:
+                self._save_index()
+
+        return added
+
+    def add_batch(self, batch: ChunkBatch) -> int:
+        """
+        Add a batch of chunks from many documents to the vector store.
+
+        Args:
+            batch: ChunkBatch from chunk_texts_batch
+
+        Returns:
+            Number of chunks added
+        """
+        if not len(batch):
+            return 0
+
+        # Every document's chunks are encoded in one call
+        return self._add(
+            batch.texts,
+            [batch.metadata(i) for i in range(len(batch))],
+            batch.chunk_indices.tolist()
+        )
+
+    def _add(self, texts: List[str], metadata: List[Dict[str, Any]], chunk_indices: List[int]) -> int:
+        """Embed texts and append them to the index with their document rows."""
+        hashes = [_text_hash(text) for text in texts]
+        self._append(texts, metadata, chunk_indices, hashes, self._vectors(texts, hashes))
+        return len(texts)
+
+    def _vectors(self, texts: List[str], hashes: List[bytes]) -> np.ndarray:
+        """Return the embedding of each text, encoding only unseen ones."""
+        # Texts already in the store reuse their stored vectors; copy them
+        # now so a concurrent clear() cannot invalidate the ids
+        with self._lock:
+            known_ids = {h: self._hash_to_id[h] for h in hashes if h in self._hash_to_id}
+            known = dict(zip(known_ids, self._reconstruct(list(known_ids.values()))))
+
+        # Encode each remaining distinct text once
+        new_texts = {h: text for h, text in zip(hashes, texts) if h not in known}
+        if new_texts:
+            known.update(zip(new_texts, self._embed(list(new_texts.values()))))
+        return np.stack([known[h] for h in hashes])
+
+    def _append(
+        self,
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        chunk_indices: List[int],
+        hashes: List[bytes],
+        embeddings: np.ndarray,
+        flush: bool = True,
+        commit: bool = True
+    ):
+        """Append embedded chunks to the index and the documents table."""
+        with self._ingest_lock:
+            with self._lock:
+                # Store document data first, so a failed insert leaves the
+                # index untouched; rows are appended to SQLite right away, the
+                # index file is rewritten every INDEX_FLUSH_EVERY vectors
+                first_id = self.ntotal
+                self._insert_documents(first_id, texts, metadata, chunk_indices, commit)
+
+                # Add to index
+                try:
+                    self._delta.add(embeddings)
+                except BaseException:
+                    self._db.execute("DELETE FROM documents WHERE id >= ?", (first_id,))
+                    if commit:
+                        self._db.commit()
+                    raise
+                for i, h in enumerate(hashes):
+                    self._hash_to_id.setdefault(h, first_id + i)
+
+            if flush and self._delta.ntotal >= INDEX_FLUSH_EVERY:
+                self._save_index()
+
+    def _truncate(self, first_id: int):
+        """Remove the vectors and uncommitted rows added from first_id on."""
+        # Streamed ingests do not flush, so their vectors are all in the delta
+        with self._lock:
+            base_total = self._base.ntotal if self._base is not None else 0
+            self._delta.remove_ids(faiss.IDSelectorRange(first_id - base_total, self._delta.ntotal))
+            # The stream's rows were never committed
+            self._db.rollback()
+            self._hash_to_id = {h: i for h, i in self._hash_to_id.items() if i < first_id}
+
+    def _reconstruct(self, ids: List[int]) -> np.ndarray:
+        """Read back the stored vectors for the given ids."""
+        vectors = np.empty((len(ids), self.embedding_dim), dtype=np.float32)
+        base_total = self._base.ntotal if self._base is not None else 0
+        for row, i in enumerate(ids):
+            if i < base_total:
+                vectors[row] = self._base.reconstruct(i)
+            else:
+                vectors[row] = self._delta.reconstruct(i - base_total)
+        return vectors
 
-        # Add to index
-        self.index.add(np.array(embeddings).astype('float32'))
+    def _embed(self, texts: List[str], **kwargs) -> np.ndarray:
+        """Encode texts as the C-contiguous float32 matrix Faiss expects."""
+        # Batches are stacked on the model's device, then cast and copied to
+        # host once; on CPU in fp32 both steps are no-ops
+        embeddings = self.model.encode(texts, convert_to_tensor=True, **kwargs)
+        embeddings = embeddings.detach().to(torch.float32).cpu().numpy()
+        # Normalize after the cast so half-precision models still yield
+        # unit vectors, in place with Faiss' SIMD kernel
+        faiss.normalize_L2(embeddings)
+        return embeddings
 
-        # Store document data
-        for chunk, embedding in zip(chunks, embeddings):
-            self.documents.append({
-                "text": chunk.text,
-                "metadata": chunk.metadata,
-                "chunk_index": chunk.chunk_index
-            })
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries, reusing the embeddings of recently seen ones."""
+        # Whitespace does not change the tokens, so it does not change the key
+        keys = [" ".join(query.split()) for query in queries]
 
-        # Persist to disk
-        self._save_index()
+        embeddings = {}
+        with self._query_cache_lock:
+            for key in keys:
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    embeddings[key] = self._query_cache[key]
 
-        return len(chunks)
+        missing = [key for key in dict.fromkeys(keys) if key not in embeddings]
+        if missing:
+            encoded = self._embed(missing, batch_size=64)
+            embeddings.update(zip(missing, encoded))
+
+            with self._query_cache_lock:
+                for key, embedding in zip(missing, encoded):
+                    self._query_cache[key] = embedding
+                while len(self._query_cache) > QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+        return np.stack([embeddings[key] for key in keys], out=self._query_buffer(len(keys)))
+
+    def _query_buffer(self, n: int) -> np.ndarray:
+        """Return this thread's (n, dim) query matrix, growing it if needed."""
+        # The matrix is only read until the search that uses it returns,
+        # and each serving thread runs one search at a time
+        buffer = getattr(self._query_buffers, "matrix", None)
+        if buffer is None or len(buffer) < n:
+            buffer = np.empty((max(n, 1), self.embedding_dim), dtype=np.float32)
+            self._query_buffers.matrix = buffer
+        return buffer[:n]
 
     def search(self, query: str, top_k: int = TOP_K) -> List[Dict[str, Any]]:
         """
@@ -99,53 +619,153 @@ class VectorStore:
         Returns:
             List of matching documents with scores
         """
-        if self.index is None or self.index.ntotal == 0:
-            return []
+        return self.search_many([query], top_k)[0]
 
-        # Generate query embedding
-        query_embedding = self.model.encode([query], normalize_embeddings=True)
+    def search_many(self, queries: List[str], top_k: int = TOP_K) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries with one encode and one index search.
 
-        # Search
-        scores, indices = self.index.search(
-            np.array(query_embedding).astype('float32'),
-            min(top_k, self.index.ntotal)
-        )
+        Args:
+            queries: Search query strings
+            top_k: Number of results to return per query
 
-        # Format results
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx >= 0:
-                doc = self.documents[idx]
-                results.append({
-                    "text": doc["text"],
-                    "metadata": doc["metadata"],
-                    "score": float(score)
-                })
+        Returns:
+            List of matching documents with scores for each query
+        """
+        if self.ntotal == 0:
+            return [[] for _ in queries]
+
+        # Generate query embeddings
+        query_embeddings = self._encode_queries(queries)
+
+        with self._lock:
+            if self.ntotal == 0:
+                return [[] for _ in queries]
+
+            # Search
+            scores, indices = self._search_index(query_embeddings, min(top_k, self.ntotal))
+
+            # Format results
+            documents = self._fetch_documents(indices[indices >= 0].tolist())
+            results = []
+            for row_scores, row_indices in zip(scores, indices):
+                hits = []
+                for score, idx in zip(row_scores.tolist(), row_indices.tolist()):
+                    if idx >= 0:
+                        text, metadata = documents[idx]
+                        hits.append({
+                            "text": text,
+                            "metadata": metadata,
+                            "score": score
+                        })
+                results.append(hits)
 
         return results
 
+    def _search_index(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the base and delta indexes and merge their top-k lists."""
+        parts = []
+        offset = 0
+        base = self._base_gpu if self._base_gpu is not None else self._base
+        for index in (base, self._delta):
+            if index is None:
+                continue
+            if index.ntotal:
+                scores, ids = self._search_one(index, queries, min(k, index.ntotal))
+                parts.append((scores, np.where(ids >= 0, ids + offset, -1)))
+            offset += index.ntotal
+
+        return _merge_top_k(parts, k)
+
+    def _search_one(self, index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search one index.
+
+        Faiss spreads an exact search over the queries, so a single query
+        scans on one core. Large flat indexes are instead cut into one
+        slice per thread and the per-slice top-k lists merged.
+        """
+        if (
+            self._scan_pool is None
+            or not isinstance(index, faiss.IndexFlat)
+            or index.ntotal < PARALLEL_SCAN_MIN
+            or len(queries) >= FAISS_THREADS
+        ):
+            return index.search(queries, k)
+
+        # Zero-copy view of the (possibly memory-mapped) vectors
+        n = index.ntotal
+        vectors = faiss.rev_swig_ptr(index.get_xb(), n * self.embedding_dim).reshape(n, self.embedding_dim)
+        bounds = np.linspace(0, n, FAISS_THREADS + 1, dtype=np.int64).tolist()
+
+        def scan(lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+            scores, ids = faiss.knn(
+                queries, vectors[lo:hi], min(k, hi - lo), metric=faiss.METRIC_INNER_PRODUCT
+            )
+            return scores, np.where(ids >= 0, ids + lo, -1)
+
+        return _merge_top_k(list(self._scan_pool.map(scan, bounds[:-1], bounds[1:])), k)
+
     def clear(self):
         """Clear all documents from the index."""
-        self.index = faiss.IndexFlatIP(self.embedding_dim)
-        self.documents = []
-        self._save_index()
+        with self._ingest_lock, self._lock:
+            self._set_base(None)
+            self._delta = self._new_index()
+            self.index_path.unlink(missing_ok=True)
+            self._db.execute("DELETE FROM documents")
+            self._db.commit()
+            self._hash_to_id = {}
+
+    def flush(self):
+        """Write vectors added since the last flush to disk."""
+        # Waits for a streamed ingest, whose rollback needs its vectors
+        # to still be in the delta
+        with self._ingest_lock:
+            if self._delta.ntotal:
+                self._save_index()
 
     def get_stats(self) -> Dict[str, Any]:
         """Get index statistics."""
         return {
-            "total_documents": len(self.documents),
+            "total_documents": self.ntotal,
             "embedding_dimension": self.embedding_dim,
             "model_name": EMBEDDING_MODEL
         }
 
 
+def _dump_metadata(metadata: Dict[str, Any]) -> bytes:
+    """Serialize chunk metadata for the documents table."""
+    # Loaders may hand over numpy scalars, e.g. values read by pandas
+    return orjson.dumps(metadata, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _text_hash(text: str) -> bytes:
+    """128-bit digest identifying a chunk's text."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def _merge_top_k(parts: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge per-partition (scores, ids) search results into one top-k list."""
+    if len(parts) == 1:
+        return parts[0]
+
+    scores = np.hstack([p[0] for p in parts])
+    ids = np.hstack([p[1] for p in parts])
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
 # Global instance
 _vector_store: Optional[VectorStore] = None
+# The store may be created from the event loop or a worker thread
+_vector_store_lock = threading.Lock()
 
 
 def get_vector_store() -> VectorStore:
     """Get or create the global vector store instance."""
     global _vector_store
     if _vector_store is None:
-        _vector_store = VectorStore()
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
     return _vector_store